@@ -0,0 +1,63 @@
+import hashlib
+import sqlite3
+
+import orjson
+
+
+class LLMCache:
+    """Exact-match cache for LLM responses, persisted in SQLite.
+
+    Identical (message_history, model) pairs produce identical requests, so
+    repeated agent traces can skip the network round-trip entirely and
+    rehydrate the stored raw JSON response instead. An in-process dict sits
+    in front of the SQLite store so repeat hits within a session never touch
+    disk.
+    """
+
+    def __init__(self, database_path: str = ".llm_cache.db"):
+        self._conn = sqlite3.connect(database_path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            "key TEXT PRIMARY KEY, response TEXT NOT NULL)"
+        )
+        self._conn.commit()
+        self._memory: dict[str, str] = {}
+
+    @staticmethod
+    def make_key(message_history: list[dict], model: str) -> str:
+        """Build a deterministic cache key for a request.
+
+        Args:
+            message_history: Full list of chat messages sent to the LLM
+            model: Model name the request targets
+
+        Returns:
+            SHA-256 hex digest of the serialized history plus model name
+        """
+        payload = orjson.dumps(
+            message_history, option=orjson.OPT_SORT_KEYS
+        ) + model.encode()
+        return hashlib.sha256(payload).hexdigest()
+
+    def get(self, key: str) -> str | None:
+        """Look up a cached raw response, or None on a miss."""
+        if key in self._memory:
+            return self._memory[key]
+
+        row = self._conn.execute(
+            "SELECT response FROM llm_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        self._memory[key] = row[0]
+        return row[0]
+
+    def set(self, key: str, response: str) -> None:
+        """Store a raw response string under the given key."""
+        self._memory[key] = response
+        self._conn.execute(
+            "INSERT OR REPLACE INTO llm_cache (key, response) VALUES (?, ?)",
+            (key, response),
+        )
+        self._conn.commit()
@@ -1,12 +1,15 @@
-import json
+import asyncio
 import os
-from enum import Enum
 from typing import Literal
 
+import httpx
+import orjson
 from dotenv import load_dotenv
-from openai import OpenAI
-from pydantic import BaseModel
+from openai import AsyncOpenAI
+from pydantic import BaseModel, TypeAdapter
 
+from llm_cache import LLMCache
+from semantic_cache import SemanticCache
 from tools import (
     create_directory,
     execute_command,
@@ -18,14 +21,19 @@ from tools import (
 
 load_dotenv()
 
-client = OpenAI()
+# A shared HTTP/2 pool keeps connections alive across steps, saving a TLS
+# handshake round-trip (~50-150ms) on every LLM call after the first.
+http_client = httpx.AsyncClient(
+    http2=True,
+    limits=httpx.Limits(max_connections=32, max_keepalive_connections=16),
+    timeout=httpx.Timeout(60.0, connect=5.0),
+)
+
+client = AsyncOpenAI(http_client=http_client)
 
+llm_cache = LLMCache()
 
-class StepType(str, Enum):
-    START = "START"
-    PLAN = "PLAN"
-    TOOL = "TOOL"
-    OUTPUT = "OUTPUT"
+semantic_cache = SemanticCache()
 
 
 class StartStep(BaseModel):
@@ -38,10 +46,24 @@ class PlanStep(BaseModel):
     content: str
 
 
+class WriteFileInput(BaseModel):
+    file_path: str
+    content: str
+
+
+class SearchCodeInput(BaseModel):
+    pattern: str
+    directory: str = "."
+    extension: str = ""
+
+
+ToolInput = str | WriteFileInput | SearchCodeInput
+
+
 class ToolStep(BaseModel):
     step: Literal["TOOL"]
     tool: str
-    input: str
+    input: ToolInput
 
 
 class OutputStep(BaseModel):
@@ -50,33 +72,167 @@ class OutputStep(BaseModel):
 
 
 class AgentResponse(BaseModel):
-    step: StepType
+    step: Literal["START", "PLAN", "TOOL", "TOOLS", "OUTPUT"]
     content: str | None = None
     tool: str | None = None
-    input: str | None = None
+    input: ToolInput | None = None
+    tools: list[ToolStep] | None = None
+
+
+# TypeAdapter caches the compiled pydantic-core validator, which runs on
+# every step of every agent loop.
+agent_response_adapter = TypeAdapter(AgentResponse)
 
 
 available_tools = {
     "read_file": read_file,
-    "write_file": lambda args: write_file(*args.split("|||", 1)),  # file_path|||content
+    "write_file": lambda args: write_file(args.file_path, args.content),
     "create_directory": create_directory,
     "list_files": list_files,
     "execute_command": execute_command,
     "search_code": lambda args: search_code(
-        *args.split("|||")
-    ),  # pattern|||directory|||extension
+        args.pattern, args.directory, args.extension
+    ),
 }
 
+LIGHT_MODEL = "gpt-4.1-nano"
+HEAVY_MODEL = "gpt-5-mini"
+
+# Routes every request to the same server-side prompt-cache shard so the
+# static SYSTEM_PROMPT and the growing message prefix hit OpenAI's cached
+# prefill instead of being recomputed each iteration.
+PROMPT_CACHE_KEY = "coding-agent-v1"
+
+
+def model_for_step(prev_step: str | None) -> str:
+    """Pick the model for the next LLM call based on the previous step.
+
+    START/PLAN/OUTPUT steps are cheap echoes and routing them to a
+    nano-tier model cuts both latency and cost; only reasoning over a
+    fresh tool observation escalates to the capable model.
+    """
+    if prev_step in ("TOOL", "TOOLS"):
+        return HEAVY_MODEL
+    return LIGHT_MODEL
+
+
+# Emoji prefixes for steps whose content is streamed to the console.
+STEP_PREFIXES = {"START": "🔥", "PLAN": "🧠", "OUTPUT": "🤖"}
+
+
+async def stream_completion(model: str, message_history: list[dict]):
+    """Make one streaming LLM call, printing step content as it arrives.
+
+    START/PLAN/OUTPUT content is printed token-by-token from partial
+    parses so the user sees reasoning immediately instead of waiting for
+    the full JSON response. Returns the final completion object.
+    """
+    printed = 0
+    prefix_emitted = False
+
+    async with client.beta.chat.completions.stream(
+        model=model,
+        response_format=AgentResponse,
+        messages=message_history,
+        prompt_cache_key=PROMPT_CACHE_KEY,
+    ) as stream:
+        async for event in stream:
+            if event.type != "content.delta" or not isinstance(event.parsed, dict):
+                continue
+
+            step = event.parsed.get("step")
+            content = event.parsed.get("content")
+            if step not in STEP_PREFIXES or not content:
+                continue
+
+            if not prefix_emitted:
+                print(f"{STEP_PREFIXES[step]} ", end="", flush=True)
+                prefix_emitted = True
+            print(content[printed:], end="", flush=True)
+            printed = len(content)
+
+        if prefix_emitted:
+            print()
+
+        return await stream.get_final_completion()
+
+
+# Bound filesystem/shell parallelism when a TOOLS step fans out.
+tool_semaphore = asyncio.Semaphore(8)
+
+
+async def dispatch_tool(tool_name: str, tool_input: ToolInput) -> str:
+    """Execute a single tool call in a worker thread and return its output."""
+    input_repr = (
+        tool_input if isinstance(tool_input, str) else tool_input.model_dump_json()
+    )
+    print(
+        f"🔧 Calling: {tool_name}({input_repr[:50]}...)"
+        if len(input_repr) > 50
+        else f"🔧 Calling: {tool_name}({input_repr})"
+    )
+
+    try:
+        async with tool_semaphore:
+            tool_response = await asyncio.to_thread(
+                available_tools[tool_name], tool_input
+            )
+        print(
+            f"🔧 Result: {tool_response[:200]}..."
+            if len(tool_response) > 200
+            else f"🔧 Result: {tool_response}"
+        )
+    except Exception as e:
+        tool_response = f"Error executing tool: {str(e)}"
+        print(f"❌ Error: {tool_response}")
+
+    return tool_response
+
+
+# Tool output above this size is truncated before entering the history;
+# full file dumps mostly waste prefill tokens on later iterations.
+MAX_OBSERVE_CHARS = 4096
+
+# History trimming: once the conversation exceeds the window, everything
+# between the original query and the most recent turns is summarized.
+HISTORY_WINDOW = 20
+HISTORY_KEEP_RECENT = 10
+
+
+def observe_message(tool_name: str, tool_input: ToolInput, tool_response: str) -> dict:
+    """Build the OBSERVE message fed back to the LLM after a tool call."""
+    if len(tool_response) > MAX_OBSERVE_CHARS:
+        truncated = len(tool_response) - MAX_OBSERVE_CHARS
+        tool_response = (
+            tool_response[:MAX_OBSERVE_CHARS]
+            + f"\n...[truncated {truncated} characters]"
+        )
+    return {
+        "role": "user",
+        "content": orjson.dumps(
+            {
+                "step": "OBSERVE",
+                "tool": tool_name,
+                "input": (
+                    tool_input
+                    if isinstance(tool_input, str)
+                    else tool_input.model_dump()
+                ),
+                "output": tool_response,
+            }
+        ).decode(),
+    }
+
 SYSTEM_PROMPT = """You are a helpful coding assistant with access to file system and code execution tools.
 You must respond in JSON format with a "step" field and additional fields based on the step type.
 
 Available tools:
 - read_file: Read the contents of a file. Input: file_path (string)
-- write_file: Write content to a file (creates or overwrites). Input: file_path|||content (separated by |||)
+- write_file: Write content to a file (creates or overwrites). Input: {"file_path": string, "content": string}
 - create_directory: Create a new directory (and parent directories). Input: directory_path (string)
 - list_files: List files and directories. Input: directory_path (string, default ".")
 - execute_command: Execute a shell command. Input: command (string)
-- search_code: Search for a pattern in code files. Input: pattern|||directory_path|||file_extension (separated by |||, last two are optional)
+- search_code: Search for a pattern in code files. Input: {"pattern": string, "directory": string, "extension": string} (directory and extension are optional)
 
 IMPORTANT: When creating new projects (websites, apps, etc.), ALWAYS:
 1. First create a dedicated directory for the project using create_directory
@@ -87,18 +243,20 @@ Step types:
 - START: Echo the user's query. Fields: step, content
 - PLAN: Your reasoning/thinking process. Fields: step, content
 - TOOL: Call a tool. Fields: step, tool, input
+- TOOLS: Call several independent tools at once. Fields: step, tools (list of objects with step, tool, input)
 - OUTPUT: Final response to user. Fields: step, content
 
-You will receive OBSERVE messages with tool results after TOOL steps.
+You will receive OBSERVE messages with tool results after TOOL steps (one per tool for TOOLS steps).
 
 Rules:
 1. Always start with a START step
 2. Use PLAN steps to reason through the problem
 3. Use TOOL step when you need to call a tool
-4. After receiving OBSERVE, continue with PLAN or OUTPUT
-5. End with OUTPUT step containing your final response
-6. For write_file, use ||| to separate file_path and content
-7. For search_code, use ||| to separate pattern, directory, and extension
+4. Use TOOLS step to batch tool calls that do not depend on each other (e.g. writing several project files)
+5. After receiving OBSERVE, continue with PLAN or OUTPUT
+6. End with OUTPUT step containing your final response
+7. For write_file, pass input as an object with "file_path" and "content"
+8. For search_code, pass input as an object with "pattern", "directory", and "extension"
 
 Example 1:
 User: What files are in the current directory?
@@ -112,7 +270,7 @@ Example 2:
 User: Create a hello.py file that prints Hello World
 START: { "step": "START", "content": "User wants to create a hello.py file" }
 PLAN: { "step": "PLAN", "content": "I need to write Python code to hello.py" }
-TOOL: { "step": "TOOL", "tool": "write_file", "input": "hello.py|||print('Hello World')" }
+TOOL: { "step": "TOOL", "tool": "write_file", "input": { "file_path": "hello.py", "content": "print('Hello World')" } }
 OBSERVE: { "step": "OBSERVE", "tool": "write_file", "output": "Successfully wrote 20 characters to 'hello.py'" }
 OUTPUT: { "step": "OUTPUT", "content": "Created hello.py with a simple print statement!" }
 
@@ -120,7 +278,7 @@ Example 3:
 User: Find all TODO comments in Python files
 START: { "step": "START", "content": "User wants to find TODO comments in Python files" }
 PLAN: { "step": "PLAN", "content": "I'll use search_code to find TODO in .py files" }
-TOOL: { "step": "TOOL", "tool": "search_code", "input": "TODO|||.|||.py" }
+TOOL: { "step": "TOOL", "tool": "search_code", "input": { "pattern": "TODO", "directory": ".", "extension": ".py" } }
 OBSERVE: { "step": "OBSERVE", "tool": "search_code", "output": "main.py:10: # TODO: Add error handling" }
 OUTPUT: { "step": "OUTPUT", "content": "Found 1 TODO comment:\\n- main.py:10" }
 
@@ -131,95 +289,152 @@ PLAN: { "step": "PLAN", "content": "I need to create a dedicated directory first
 TOOL: { "step": "TOOL", "tool": "create_directory", "input": "bakery-website" }
 OBSERVE: { "step": "OBSERVE", "tool": "create_directory", "output": "Successfully created directory 'bakery-website'" }
 PLAN: { "step": "PLAN", "content": "Now I'll create index.html inside bakery-website/" }
-TOOL: { "step": "TOOL", "tool": "write_file", "input": "bakery-website/index.html|||<!DOCTYPE html>..." }
+TOOL: { "step": "TOOL", "tool": "write_file", "input": { "file_path": "bakery-website/index.html", "content": "<!DOCTYPE html>..." } }
 OBSERVE: { "step": "OBSERVE", "tool": "write_file", "output": "Successfully wrote 2500 characters to 'bakery-website/index.html'" }
 PLAN: { "step": "PLAN", "content": "Now I'll create styles.css" }
-TOOL: { "step": "TOOL", "tool": "write_file", "input": "bakery-website/styles.css|||/* Modern bakery styles */..." }
+TOOL: { "step": "TOOL", "tool": "write_file", "input": { "file_path": "bakery-website/styles.css", "content": "/* Modern bakery styles */..." } }
 OBSERVE: { "step": "OBSERVE", "tool": "write_file", "output": "Successfully wrote 1800 characters to 'bakery-website/styles.css'" }
 PLAN: { "step": "PLAN", "content": "Finally, I'll create script.js" }
-TOOL: { "step": "TOOL", "tool": "write_file", "input": "bakery-website/script.js|||// Interactive features..." }
+TOOL: { "step": "TOOL", "tool": "write_file", "input": { "file_path": "bakery-website/script.js", "content": "// Interactive features..." } }
 OBSERVE: { "step": "OBSERVE", "tool": "write_file", "output": "Successfully wrote 950 characters to 'bakery-website/script.js'" }
 OUTPUT: { "step": "OUTPUT", "content": "Created a beautiful bakery landing page in the bakery-website/ directory with:\\n- index.html (hero, menu, about, contact sections)\\n- styles.css (modern gradients, animations, responsive design)\\n- script.js (smooth scrolling, form validation)\\n\\nOpen bakery-website/index.html in a browser to view it!" }
 """
 
 
-def run_agent(user_query: str) -> str:
+def trim_history(message_history: list[dict]) -> None:
+    """Collapse older turns so per-call prompt size stays bounded.
+
+    The system prompt, the original user query, and the most recent
+    HISTORY_KEEP_RECENT messages stay verbatim; everything in between is
+    replaced with a single assistant note listing one truncated line per
+    step. Without this, every OBSERVE (file contents, search results)
+    re-enters the prompt on every subsequent iteration.
+    """
+    if len(message_history) <= HISTORY_WINDOW:
+        return
+
+    older = message_history[2:-HISTORY_KEEP_RECENT]
+    lines = [f"- {(message['content'] or '')[:120]}" for message in older]
+    summary = (
+        f"<summary of {len(older)} earlier steps>\n" + "\n".join(lines)
+    )
+    message_history[2:-HISTORY_KEEP_RECENT] = [
+        {"role": "assistant", "content": summary}
+    ]
+
+
+async def handle_start(
+    parsed: AgentResponse, message_history: list[dict], user_query: str, streamed: bool
+) -> str | None:
+    if not streamed:
+        print(f"🔥 {parsed.content}")
+    return None
+
+
+async def handle_plan(
+    parsed: AgentResponse, message_history: list[dict], user_query: str, streamed: bool
+) -> str | None:
+    if not streamed:
+        print(f"🧠 {parsed.content}")
+    return None
+
+
+async def handle_tool(
+    parsed: AgentResponse, message_history: list[dict], user_query: str, streamed: bool
+) -> str | None:
+    tool_response = await dispatch_tool(parsed.tool, parsed.input)
+    message_history.append(observe_message(parsed.tool, parsed.input, tool_response))
+    return None
+
+
+async def handle_tools(
+    parsed: AgentResponse, message_history: list[dict], user_query: str, streamed: bool
+) -> str | None:
+    tool_steps = parsed.tools or []
+    tool_responses = await asyncio.gather(
+        *[dispatch_tool(t.tool, t.input) for t in tool_steps]
+    )
+    for tool_step, tool_response in zip(tool_steps, tool_responses):
+        message_history.append(
+            observe_message(tool_step.tool, tool_step.input, tool_response)
+        )
+    return None
+
+
+async def handle_output(
+    parsed: AgentResponse, message_history: list[dict], user_query: str, streamed: bool
+) -> str | None:
+    if not streamed:
+        print(f"🤖 {parsed.content}")
+    semantic_cache.set(user_query, parsed.content)
+    return parsed.content
+
+
+# O(1) step dispatch; a returned string ends the agent loop.
+DISPATCH = {
+    "START": handle_start,
+    "PLAN": handle_plan,
+    "TOOL": handle_tool,
+    "TOOLS": handle_tools,
+    "OUTPUT": handle_output,
+}
+
+
+async def run_agent(user_query: str) -> str:
     """Run the coding agent with explicit chain of thought reasoning."""
     print(f"\n{'='*50}")
     print(f"User Query: {user_query}")
     print(f"{'='*50}\n")
 
+    cached_output = semantic_cache.get(user_query)
+    if cached_output is not None:
+        print(f"🤖 {cached_output}")
+        return cached_output
+
     message_history = [
         {"role": "system", "content": SYSTEM_PROMPT},
         {"role": "user", "content": user_query},
     ]
 
-    while True:
-        try:
-            response = client.beta.chat.completions.parse(
-                model="gpt-5-mini",
-                response_format=AgentResponse,
-                messages=message_history,
-            )
-        except Exception as e:
-            print(f"❌ Error calling LLM: {str(e)}")
-            return "Error: Failed to get response from LLM"
-
-        parsed_result = response.choices[0].message.parsed
-        raw_result = response.choices[0].message.content
-        message_history.append({"role": "assistant", "content": raw_result})
+    prev_step: str | None = None
 
-        if parsed_result.step == StepType.START:
-            print(f"🔥 {parsed_result.content}")
-            continue
+    while True:
+        trim_history(message_history)
+        model = model_for_step(prev_step)
+        cache_key = LLMCache.make_key(message_history, model)
+        cached_result = llm_cache.get(cache_key)
 
-        if parsed_result.step == StepType.PLAN:
-            print(f"🧠 {parsed_result.content}")
-            continue
-
-        if parsed_result.step == StepType.TOOL:
-            tool_to_call = parsed_result.tool
-            tool_input = parsed_result.input
-            print(
-                f"🔧 Calling: {tool_to_call}({tool_input[:50]}...)"
-                if len(tool_input) > 50
-                else f"🔧 Calling: {tool_to_call}({tool_input})"
-            )
+        streamed = cached_result is None
 
+        if cached_result is not None:
+            parsed_result = agent_response_adapter.validate_json(cached_result)
+            raw_result = cached_result
+        else:
             try:
-                tool_response = available_tools[tool_to_call](tool_input)
-                print(
-                    f"🔧 Result: {tool_response[:200]}..."
-                    if len(tool_response) > 200
-                    else f"🔧 Result: {tool_response}"
-                )
+                response = await stream_completion(model, message_history)
             except Exception as e:
-                tool_response = f"Error executing tool: {str(e)}"
-                print(f"❌ Error: {tool_response}")
-
-            message_history.append(
-                {
-                    "role": "user",
-                    "content": json.dumps(
-                        {
-                            "step": "OBSERVE",
-                            "tool": tool_to_call,
-                            "input": tool_input,
-                            "output": tool_response,
-                        }
-                    ),
-                }
-            )
-            continue
+                print(f"❌ Error calling LLM: {str(e)}")
+                return "Error: Failed to get response from LLM"
 
-        if parsed_result.step == StepType.OUTPUT:
-            print(f"🤖 {parsed_result.content}")
-            return parsed_result.content
+            raw_result = response.choices[0].message.content
+            parsed_result = agent_response_adapter.validate_json(raw_result)
+
+            # Tool steps are side-effectful (observations may differ between
+            # runs), so only deterministic reasoning steps are cached.
+            if parsed_result.step not in ("TOOL", "TOOLS"):
+                llm_cache.set(cache_key, raw_result)
+
+        message_history.append({"role": "assistant", "content": raw_result})
+        prev_step = parsed_result.step
 
-    return "No response generated"
+        result = await DISPATCH[parsed_result.step](
+            parsed_result, message_history, user_query, streamed
+        )
+        if result is not None:
+            return result
 
 
-def main():
+async def main():
     print("Coding Agent (type 'quit' to exit)")
     print("-" * 40)
 
@@ -233,8 +448,8 @@ def main():
         if not user_input:
             continue
 
-        run_agent(user_input)
+        await run_agent(user_input)
 
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())
@@ -0,0 +1,72 @@
+try:
+    import faiss
+    import numpy as np
+    from sentence_transformers import SentenceTransformer
+
+    SEMANTIC_CACHE_AVAILABLE = True
+except ImportError:
+    SEMANTIC_CACHE_AVAILABLE = False
+
+
+class SemanticCache:
+    """Similarity cache mapping user queries to prior final responses.
+
+    Paraphrased queries ("list files here" vs "show me the files in this
+    dir") normally re-run the entire multi-step agent chain. This cache
+    embeds each query with all-MiniLM-L6-v2 (384-dim), stores normalized
+    vectors in a FAISS inner-product index, and returns the stored OUTPUT
+    directly when a new query's cosine similarity clears the threshold.
+
+    Requires the optional `faiss-cpu` and `sentence-transformers`
+    dependencies (`uv sync --extra semantic-cache`); without them the cache
+    is inert and every get() misses.
+    """
+
+    def __init__(self, threshold: float = 0.85):
+        self.threshold = threshold
+        self._exact: dict[str, str] = {}
+        self._responses: list[str] = []
+
+        if SEMANTIC_CACHE_AVAILABLE:
+            self._model = SentenceTransformer("all-MiniLM-L6-v2")
+            self._index = faiss.IndexFlatIP(384)
+        else:
+            self._model = None
+            self._index = None
+
+    def _embed(self, query: str) -> "np.ndarray":
+        """Embed a query as a normalized (1, 384) float32 vector."""
+        vector = self._model.encode([query], convert_to_numpy=True)
+        vector = vector.astype(np.float32)
+        faiss.normalize_L2(vector)
+        return vector
+
+    def get(self, query: str) -> str | None:
+        """Return a cached response for a similar prior query, or None.
+
+        Args:
+            query: The user's query text
+
+        Returns:
+            The stored response if an exact or similar query was cached,
+            otherwise None
+        """
+        if query in self._exact:
+            return self._exact[query]
+
+        if self._index is None or self._index.ntotal == 0:
+            return None
+
+        scores, indices = self._index.search(self._embed(query), 1)
+        if scores[0][0] >= self.threshold:
+            return self._responses[indices[0][0]]
+
+        return None
+
+    def set(self, query: str, response: str) -> None:
+        """Store a query/response pair for future similarity lookups."""
+        self._exact[query] = response
+
+        if self._index is not None:
+            self._index.add(self._embed(query))
+            self._responses.append(response)
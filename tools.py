@@ -1,12 +1,47 @@
+import mmap
 import os
+import re
+import selectors
+import shutil
 import subprocess
+import time
+from collections import deque
 from pathlib import Path
 from typing import Any
 
 
+# Files above this size are truncated to head + tail: huge files would blow
+# up memory and overflow the LLM context anyway.
+MAX_READ_BYTES = 200_000
+READ_HEAD_BYTES = 100_000
+READ_TAIL_BYTES = 50_000
+
+# Compiled once; anchored patterns avoid the old substring check's false
+# positives (e.g. 'address' used to trip the bare 'dd' keyword)
+_DANGER_RE = re.compile(
+    r"rm\s+-rf\s+/|\bmkfs\b|\bdd\s+if=|\bformat\b|:\(\)\{:\|:&\};:",
+    re.IGNORECASE,
+)
+
+# execute_command keeps only the most recent output lines: the tail of a
+# long build log is what matters, and memory stays O(1)
+COMMAND_TIMEOUT = 30
+MAX_OUTPUT_LINES = 500
+
+# Vendored/generated directories that search_code never descends into
+SKIP_DIRS = {
+    ".git", ".venv", "venv", "node_modules", "__pycache__",
+    "dist", "build", ".next", "target",
+}
+
+
 def read_file(file_path: str) -> str:
     """Read the contents of a file.
 
+    Large files (over MAX_READ_BYTES) are returned as the first 100KB plus
+    the last 50KB with a truncation marker, so a stray log file never gets
+    fully materialized or serialized into the LLM context.
+
     Args:
         file_path: Path to the file to read (relative or absolute)
 
@@ -21,6 +56,19 @@ def read_file(file_path: str) -> str:
         if not path.is_file():
             return f"Error: '{file_path}' is not a file"
 
+        size = path.stat().st_size
+        if size > MAX_READ_BYTES:
+            with open(path, 'rb') as f:
+                head = f.read(READ_HEAD_BYTES)
+                f.seek(-READ_TAIL_BYTES, os.SEEK_END)
+                tail = f.read(READ_TAIL_BYTES)
+            truncated = size - READ_HEAD_BYTES - READ_TAIL_BYTES
+            return (
+                head.decode('utf-8', errors='replace')
+                + f"\n...[truncated {truncated} bytes]...\n"
+                + tail.decode('utf-8', errors='replace')
+            )
+
         with open(path, 'r', encoding='utf-8') as f:
             content = f.read()
 
@@ -29,6 +77,22 @@ def read_file(file_path: str) -> str:
         return f"Error reading file: {str(e)}"
 
 
+def _write(file_path: str, content: str) -> None:
+    """Write content to a path whose parent directory already exists."""
+    if len(content) > 1_000_000:
+        # One encode + one syscall beats the text wrapper's chunked
+        # encoder for large payloads
+        fd = os.open(file_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            os.write(fd, content.encode('utf-8'))
+        finally:
+            os.close(fd)
+        return
+
+    with open(file_path, 'w', encoding='utf-8') as f:
+        f.write(content)
+
+
 def write_file(file_path: str, content: str) -> str:
     """Write content to a file (creates or overwrites).
 
@@ -40,13 +104,13 @@ def write_file(file_path: str, content: str) -> str:
         Success message or error
     """
     try:
-        path = Path(file_path)
-
-        # Create parent directories if they don't exist
-        path.parent.mkdir(parents=True, exist_ok=True)
-
-        with open(path, 'w', encoding='utf-8') as f:
-            f.write(content)
+        # EAFP: the parent directory usually exists, so try the write
+        # first and only pay for mkdir when it actually fails
+        try:
+            _write(file_path, content)
+        except FileNotFoundError:
+            Path(file_path).parent.mkdir(parents=True, exist_ok=True)
+            _write(file_path, content)
 
         return f"Successfully wrote {len(content)} characters to '{file_path}'"
     except Exception as e:
@@ -98,12 +162,16 @@ def list_files(directory_path: str = ".") -> str:
             return f"Error: '{directory_path}' is not a directory"
 
         items = []
-        for item in sorted(path.iterdir()):
-            if item.is_dir():
-                items.append(f"[DIR]  {item.name}/")
+        # scandir returns DirEntry objects whose is_dir()/stat() reuse the
+        # data from the directory read, avoiding an extra stat per entry.
+        with os.scandir(path) as it:
+            entries = sorted(it, key=lambda entry: entry.name)
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                items.append(f"[DIR]  {entry.name}/")
             else:
-                size = item.stat().st_size
-                items.append(f"[FILE] {item.name} ({size} bytes)")
+                size = entry.stat().st_size
+                items.append(f"[FILE] {entry.name} ({size} bytes)")
 
         if not items:
             return f"Directory '{directory_path}' is empty"
@@ -124,33 +192,173 @@ def execute_command(command: str) -> str:
     """
     try:
         # Security: Block potentially dangerous commands
-        dangerous_keywords = ['rm -rf /', 'dd', 'mkfs', 'format', ':(){:|:&};:']
-        if any(keyword in command.lower() for keyword in dangerous_keywords):
+        if _DANGER_RE.search(command):
             return "Error: Command blocked for safety reasons"
 
-        result = subprocess.run(
+        proc = subprocess.Popen(
             command,
             shell=True,
-            capture_output=True,
-            text=True,
-            timeout=30
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
         )
 
+        # Stream output incrementally, keeping only the newest lines so a
+        # chatty build can't buffer unbounded output in memory
+        tail = deque(maxlen=MAX_OUTPUT_LINES)
+        dropped = 0
+        timed_out = False
+        deadline = time.monotonic() + COMMAND_TIMEOUT
+        pending = b''
+
+        # Read raw chunks with os.read and split lines ourselves: readline()
+        # would block past the deadline on a partial line (e.g. an
+        # interactive 'Continue? [y/n] ' prompt that never completes)
+        with selectors.DefaultSelector() as sel:
+            sel.register(proc.stdout, selectors.EVENT_READ)
+            fd = proc.stdout.fileno()
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    timed_out = True
+                    break
+                if not sel.select(timeout=remaining):
+                    continue
+                chunk = os.read(fd, 65536)
+                if not chunk:
+                    break
+                pending += chunk
+                *lines, pending = pending.split(b'\n')
+                for line in lines:
+                    if len(tail) == MAX_OUTPUT_LINES:
+                        dropped += 1
+                    tail.append(line.decode('utf-8', errors='replace'))
+
+        # Keep any trailing partial line (prompt text, truncated output)
+        if pending:
+            if len(tail) == MAX_OUTPUT_LINES:
+                dropped += 1
+            tail.append(pending.decode('utf-8', errors='replace'))
+
+        if timed_out:
+            proc.terminate()
+            try:
+                proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+                proc.wait()
+        else:
+            proc.wait()
+
         output = []
-        if result.stdout:
-            output.append(f"STDOUT:\n{result.stdout}")
-        if result.stderr:
-            output.append(f"STDERR:\n{result.stderr}")
-        if result.returncode != 0:
-            output.append(f"Exit code: {result.returncode}")
+        if dropped:
+            output.append(f"[... {dropped} earlier lines dropped]")
+        output.extend(tail)
+        if timed_out:
+            output.append(
+                f"Error: Command timed out after {COMMAND_TIMEOUT} seconds"
+            )
+        elif proc.returncode != 0:
+            output.append(f"Exit code: {proc.returncode}")
 
         return "\n".join(output) if output else "(No output)"
-    except subprocess.TimeoutExpired:
-        return "Error: Command timed out after 30 seconds"
     except Exception as e:
         return f"Error executing command: {str(e)}"
 
 
+def _search_code_ripgrep(pattern: str, path: Path, file_extension: str) -> list[str] | None:
+    """Search with ripgrep if it is installed.
+
+    ripgrep memory-maps files and uses SIMD-accelerated matching, so it is
+    10-100x faster than the pure-Python scan on real repositories.
+
+    Args:
+        pattern: Literal text pattern to search for (case-insensitive)
+        path: Directory to search in
+        file_extension: Filter by file extension (e.g., '.py', '.js')
+
+    Returns:
+        List of "file:line: text" matches, or None if ripgrep is
+        unavailable or failed (caller falls back to the Python scan)
+    """
+    if shutil.which('rg') is None:
+        return None
+
+    command = ['rg', '--line-number', '--no-heading', '-i', '-F']
+    if file_extension:
+        command += ['--glob', f'*{file_extension}']
+    # '--' keeps dash-leading patterns like '-Wall' or '--json' from being
+    # parsed as rg flags
+    command += ['--', pattern, '.']
+
+    try:
+        result = subprocess.run(
+            command,
+            cwd=path,
+            capture_output=True,
+            text=True,
+            timeout=30
+        )
+    except (subprocess.TimeoutExpired, OSError):
+        return None
+
+    # ripgrep exits 0 on matches, 1 on no matches, 2 on error
+    if result.returncode not in (0, 1):
+        return None
+
+    return [line.removeprefix('./') for line in result.stdout.splitlines()]
+
+
+def _search_file_mmap(file_path: str, regex: "re.Pattern[bytes]") -> list[tuple[int, str]]:
+    """Scan one file for a compiled pattern via mmap.
+
+    Matching runs directly on the memory-mapped bytes, so the bulk scan
+    happens in C instead of allocating a decoded, lowercased string per
+    line. Line numbers are recovered incrementally from newline counts.
+
+    Args:
+        file_path: Path of the file to scan
+        regex: Compiled case-insensitive bytes pattern
+
+    Returns:
+        List of (line_number, line_text) tuples, one per matching line
+    """
+    results = []
+    with open(file_path, 'rb') as f:
+        try:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files can't be mapped
+            return results
+
+        with buf:
+            # Cheap binary sniff: a NUL byte in the first 1KB means this
+            # is not a text file worth scanning
+            if b'\x00' in buf[:1024]:
+                return results
+
+            line_num = 1
+            counted_to = 0
+            prev_line_start = -1
+            for match in regex.finditer(buf):
+                # Slicing an mmap yields bytes; spans between matches are
+                # disjoint, so total copying stays bounded by the file size
+                line_num += buf[counted_to:match.start()].count(b'\n')
+                counted_to = match.start()
+
+                line_start = buf.rfind(b'\n', 0, match.start()) + 1
+                if line_start == prev_line_start:
+                    continue
+                prev_line_start = line_start
+
+                line_end = buf.find(b'\n', match.start())
+                if line_end == -1:
+                    line_end = len(buf)
+                line = buf[line_start:line_end].decode('utf-8', errors='ignore')
+                results.append((line_num, line.strip()))
+
+    return results
+
+
 def search_code(pattern: str, directory_path: str = ".", file_extension: str = "") -> str:
     """Search for a pattern in code files.
 
@@ -168,30 +376,47 @@ def search_code(pattern: str, directory_path: str = ".", file_extension: str = "
         if not path.exists():
             return f"Error: Directory '{directory_path}' does not exist"
 
+        rg_matches = _search_code_ripgrep(pattern, path, file_extension)
+        if rg_matches is not None:
+            if not rg_matches:
+                return f"No matches found for '{pattern}'"
+            if len(rg_matches) > 50:
+                return "\n".join(rg_matches[:50]) + f"\n... ({len(rg_matches) - 50} more matches)"
+            return "\n".join(rg_matches)
+
         matches = []
         search_count = 0
 
-        # Search recursively
-        for file_path in path.rglob('*'):
-            # Skip directories and hidden files
-            if file_path.is_dir() or file_path.name.startswith('.'):
-                continue
-
-            # Filter by extension if specified
-            if file_extension and not file_path.name.endswith(file_extension):
-                continue
-
-            try:
-                with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                    for line_num, line in enumerate(f, 1):
-                        if pattern.lower() in line.lower():
-                            matches.append(
-                                f"{file_path.relative_to(path)}:{line_num}: {line.strip()}"
-                            )
-                search_count += 1
-            except Exception:
-                # Skip files that can't be read
-                continue
+        # Compile once; IGNORECASE on bytes gives ASCII case-insensitivity
+        # without the per-line .lower() allocations of the old scan
+        regex = re.compile(re.escape(pattern).encode(), re.IGNORECASE)
+
+        # os.walk is materially faster than Path.rglob and lets us prune
+        # hidden directories in place instead of descending into them
+        for root, dirs, files in os.walk(path):
+            dirs[:] = [
+                d for d in dirs if d not in SKIP_DIRS and not d.startswith('.')
+            ]
+
+            for file_name in files:
+                # Skip hidden files
+                if file_name.startswith('.'):
+                    continue
+
+                # Filter by extension if specified
+                if file_extension and not file_name.endswith(file_extension):
+                    continue
+
+                file_path = os.path.join(root, file_name)
+                try:
+                    for line_num, line in _search_file_mmap(file_path, regex):
+                        matches.append(
+                            f"{os.path.relpath(file_path, path)}:{line_num}: {line}"
+                        )
+                    search_count += 1
+                except Exception:
+                    # Skip files that can't be read
+                    continue
 
         if not matches:
             return f"No matches found for '{pattern}' in {search_count} files"